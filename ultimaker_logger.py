@@ -1,33 +1,143 @@
-from typing import List, Dict, Set, Optional, Any, Union
+from typing import List, Dict, Set, Optional, Any, Union, Tuple
 import requests
 import csv
+import hashlib
+import io
+import json
 import logging
+import math
+import os
+import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import quote
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from google.auth.transport.requests import AuthorizedSession
+from google.oauth2.service_account import Credentials
 from datetime import datetime
 import pytz
-from gspread.exceptions import APIError
 import xml.etree.ElementTree as ET
 
 # Configuration
 CONFIG = {
     'SHEET_NAME': 'Makerspace 3D Printer Stats',
     'CREDENTIALS_PATH': '/opt/ulti/credentials.json',
+    'MATERIAL_CACHE_PATH': '/opt/ulti/materials.json',
     'MAX_RETRIES': 3,
     'RETRY_BACKOFF': 0.5,
     'REQUEST_TIMEOUT': 10,
-    'BATCH_SIZE': 50
+    'SHEETS_TIMEOUT': 60,
+    'SHEETS_MAX_RETRIES': 5,
+    'BATCH_SIZE': 50,
+    'MAX_WORKERS': 16,
+    'MATERIAL_WORKERS': 4,
+    'UUID_CAPACITY': 100_000,
+    'UUID_ERROR_RATE': 1e-6,
+    'INDEX_FINGERPRINT_BYTES': 4096
 }
 
+SHEETS_SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+
+# Returned by PrinterAPI.make_request when a conditional request is answered 304
+NOT_MODIFIED = object()
+
+# Log columns, in the order rows are written to the CSV and the sheet
+FIELDNAMES = [
+    'uuid', 'printer_name', 'date', 'datetime_started', 'datetime_finished',
+    'name', 'result', 'time_total', 'material_0_amount',
+    'material_1_amount', 'material_0_name', 'material_1_name'
+]
+
+# Print results that are written to the log
+LOGGED_RESULTS = {'Finished', 'Aborted'}
+
+# Material name element in Ultimaker material profiles (Clark notation)
+_MATERIAL_XPATH = ".//{http://www.ultimaker.com/material}material"
+
+# Local timezone for logged timestamps
+_PST = pytz.timezone("America/Los_Angeles")
+
+def _file_mode(path: Path) -> int:
+    """Permissions for a rewritten file: keep the existing mode, else the umask default."""
+    try:
+        return path.stat().st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+def _write_bytes_atomic(path: Path, data: bytes) -> None:
+    """Write to a temporary file and swap it in so readers never see a torn file."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # mkstemp creates the file owner-only; match what a plain write would give
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _write_json_atomic(path: Path, data: Any) -> None:
+    _write_bytes_atomic(path, json.dumps(data, indent=2, sort_keys=True).encode('utf-8'))
+
+class BloomFilter:
+    """Compact probabilistic set of strings.
+
+    Membership tests never miss an added item but may report an item that
+    was never added, with a probability of about ``error_rate`` while fewer
+    than ``capacity`` items have been added.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.capacity = capacity
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Double hashing: derive every bit position from one 128-bit digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: Any) -> bool:
+        if not isinstance(item, str):
+            return False
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def __len__(self) -> int:
+        return self.count
+
 class PrinterAPI:
+    # Material GUIDs are globally unique, so names are shared across printers
+    _material_cache: Dict[str, str] = {}
+    _material_locks: Dict[str, threading.Lock] = {}
+    _material_locks_guard = threading.Lock()
+
     def __init__(self, ip: str, session: requests.Session):
         self.ip = ip
         self.session = session
         self._name = None
+        # HTTP validators per endpoint, sent on conditional GETs. Validators
+        # seen during a poll stay pending until the jobs they cover are saved.
+        self.validators: Dict[str, Dict[str, str]] = {}
+        self._pending_validators: Dict[str, Dict[str, str]] = {}
+        # Whether the last saved scan reached the end of this printer's history
+        self.history_complete = False
 
     @property
     def name(self) -> str:
@@ -39,41 +149,123 @@ class PrinterAPI:
                 self._name = f"Printer-{self.ip}"
         return self._name
 
-    def make_request(self, endpoint: str) -> dict:
+    def make_request(self, endpoint: str, conditional: bool = False) -> Any:
+        """GET an API endpoint and return its decoded JSON ({} on failure).
+
+        Responses that are not JSON are returned as text.
+
+        With conditional=True the request carries the validators from the
+        previous response and NOT_MODIFIED is returned on a 304.
+        """
         try:
             url = f"http://{self.ip}/api/v1/{endpoint}"
-            response = self.session.get(url, timeout=CONFIG['REQUEST_TIMEOUT'])
+            headers = {}
+            if conditional:
+                saved = self.validators.get(endpoint, {})
+                if 'etag' in saved:
+                    headers['If-None-Match'] = saved['etag']
+                if 'last_modified' in saved:
+                    headers['If-Modified-Since'] = saved['last_modified']
+            response = self.session.get(url, headers=headers, timeout=CONFIG['REQUEST_TIMEOUT'])
+            if response.status_code == 304:
+                return NOT_MODIFIED
             response.raise_for_status()
-            return response.json()
+            if conditional:
+                received = {}
+                if 'ETag' in response.headers:
+                    received['etag'] = response.headers['ETag']
+                if 'Last-Modified' in response.headers:
+                    received['last_modified'] = response.headers['Last-Modified']
+                if received:
+                    self._pending_validators[endpoint] = received
+            try:
+                return response.json()
+            except requests.exceptions.JSONDecodeError:
+                # Some endpoints, such as materials, answer with XML
+                return response.text
         except requests.exceptions.RequestException as e:
             logging.warning(f"Request failed for {self.ip} at {endpoint}: {e}")
             return {}
 
+    def commit_validators(self) -> None:
+        """Use the validators from the last poll once its jobs are saved."""
+        self.validators.update(self._pending_validators)
+        self._pending_validators.clear()
+
+    def discard_validators(self) -> None:
+        """Forget all validators after a scan that stopped early.
+
+        A 304 ends the scan, so validators must not survive a scan that
+        left older history unfetched.
+        """
+        self.validators.clear()
+        self._pending_validators.clear()
+
     def get_material_name(self, material_guid: str) -> str:
         if not material_guid:
             return "Unknown"
+        cached = self._material_cache.get(material_guid)
+        if cached is not None:
+            return cached
+
+        # One lookup per GUID; concurrent callers wait for the first result
+        with self._material_locks_guard:
+            lock = self._material_locks.setdefault(material_guid, threading.Lock())
+        with lock:
+            cached = self._material_cache.get(material_guid)
+            if cached is None:
+                cached = self._fetch_material_name(material_guid)
+                self._material_cache[material_guid] = cached
+            return cached
+
+    def _fetch_material_name(self, material_guid: str) -> str:
+        # Lookups run outside any per-job error handling, so a bad material
+        # must never raise and abort the whole poll
         try:
             response = self.make_request(f"materials/{material_guid}")
             if isinstance(response, str):  # If the response is XML
                 try:
                     root = ET.fromstring(response)
-                    material_element = root.find(".//{http://www.ultimaker.com/material}material")
-                    if material_element is not None:
+                    material_element = root.find(_MATERIAL_XPATH)
+                    if material_element is not None and material_element.text:
                         return material_element.text.strip()
                 except ET.ParseError:
                     logging.warning(f"Failed to parse material XML for GUID {material_guid}")
             return "Unknown"
-        except requests.exceptions.RequestException:
+        except Exception as e:
+            logging.warning(f"Failed to look up material {material_guid} on {self.ip}: {e}")
             return "Unknown"
 
 class UltimakerLogger:
     def __init__(self, ip_file: str, csv_path: str = 'print_logs.csv'):
         self.printer_ips = self._load_printer_ips(ip_file)
         self.csv_path = Path(csv_path)
-        self.existing_uuids = set()
-        self.session = self._setup_requests_session()
+        self.index_path = self.csv_path.with_suffix('.idx')
+        self.bloom_path = self.csv_path.with_suffix('.bloom')
+        self.validators_path = self.csv_path.with_suffix('.validators.json')
+        self.scan_state_path = self.csv_path.with_suffix('.scan.json')
+        self.existing_uuids = self._new_uuid_filter()
+        self.session = self._setup_requests_session(len(self.printer_ips))
         self.printers = [PrinterAPI(ip, self.session) for ip in self.printer_ips]
+        self._gsession: Optional[AuthorizedSession] = None
+        self._append_url: Optional[str] = None
+        self.material_cache_path = Path(CONFIG['MATERIAL_CACHE_PATH'])
+        self._saved_materials: Dict[str, str] = {}
+        self._load_material_cache()
         self._load_existing_uuids()
+        self._load_validators()
+        self._load_scan_state()
+        self._prewarm_names()
+
+    def _printer_workers(self) -> int:
+        return min(CONFIG['MAX_WORKERS'], len(self.printers))
+
+    def _prewarm_names(self) -> None:
+        """Resolve every printer's name concurrently instead of one by one."""
+        if not self.printers:
+            return
+        with ThreadPoolExecutor(max_workers=self._printer_workers()) as executor:
+            list(executor.map(lambda printer: printer.name, self.printers))
 
     def _load_printer_ips(self, ip_file: str) -> list:
         try:
@@ -83,63 +275,280 @@ class UltimakerLogger:
             logging.error(f"IP file '{ip_file}' not found. Exiting.")
             exit(1)
 
-    def _setup_requests_session(self) -> requests.Session:
+    def _setup_requests_session(self, printer_count: int) -> requests.Session:
         session = requests.Session()
+        session.headers['Connection'] = 'keep-alive'
+        session.headers['Accept'] = 'application/json, */*;q=0.1'
         retry_strategy = Retry(
             total=CONFIG['MAX_RETRIES'],
             backoff_factor=CONFIG['RETRY_BACKOFF'],
             status_forcelist=[429, 500, 502, 503, 504],
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Size the pool so every printer keeps its connection for the whole run
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=max(32, printer_count),
+            pool_maxsize=max(32, printer_count * 4),
+            pool_block=False,
+        )
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         return session
 
+    @staticmethod
+    def _new_uuid_filter() -> BloomFilter:
+        return BloomFilter(CONFIG['UUID_CAPACITY'], CONFIG['UUID_ERROR_RATE'])
+
     def _load_existing_uuids(self) -> None:
+        """Fill existing_uuids, parsing only rows the sidecar index has not seen."""
         try:
             if self.csv_path.exists():
-                with self.csv_path.open('r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    self.existing_uuids = {row['uuid'] for row in reader if row['uuid']}
+                with self.csv_path.open('rb') as raw:
+                    first_line = raw.readline().decode('utf-8')
+                    header = next(csv.reader([first_line]), None) if first_line else None
+                    idx = header.index('uuid') if header else 0
+                    header_end = raw.tell()
+                    offset = self._load_uuid_index(raw)
+                    raw.seek(max(offset, header_end))
+                    reader = csv.reader(io.TextIOWrapper(raw, encoding='utf-8', newline=''))
+                    for row in reader:
+                        if len(row) > idx and row[idx]:
+                            self.existing_uuids.add(row[idx])
+                    end = raw.tell()
                 logging.info(f"Loaded {len(self.existing_uuids)} existing UUIDs")
+                if len(self.existing_uuids) > self.existing_uuids.capacity:
+                    logging.warning("Existing UUIDs exceed UUID_CAPACITY; raise it to keep duplicate detection accurate")
+                if end != offset:
+                    self._save_uuid_index(end)
         except Exception as e:
             logging.error(f"Error loading existing UUIDs: {e}")
-            self.existing_uuids = set()
+            self.existing_uuids = self._new_uuid_filter()
+
+    @staticmethod
+    def _csv_fingerprint(raw: io.BufferedReader, offset: int) -> str:
+        """Hash the CSV bytes just before offset, to detect an edited or replaced log."""
+        start = max(0, offset - CONFIG['INDEX_FINGERPRINT_BYTES'])
+        raw.seek(start)
+        return hashlib.blake2b(raw.read(offset - start), digest_size=16).hexdigest()
+
+    def _load_uuid_index(self, raw: io.BufferedReader) -> int:
+        """Restore existing_uuids from the sidecar index and return the CSV offset it covers."""
+        try:
+            if not (self.index_path.exists() and self.bloom_path.exists()):
+                return 0
+            with self.index_path.open('r', encoding='utf-8') as f:
+                index = json.load(f)
+            uuids = self._new_uuid_filter()
+            bits = self.bloom_path.read_bytes()
+            csv_size = raw.seek(0, os.SEEK_END)
+            if (index['size'] != uuids.size or index['hash_count'] != uuids.hash_count
+                    or len(bits) != len(uuids.bits)
+                    or hashlib.blake2b(bits, digest_size=16).hexdigest() != index['bits_digest']
+                    or index['offset'] > csv_size
+                    or self._csv_fingerprint(raw, index['offset']) != index['fingerprint']):
+                logging.info("UUID index does not match the log, rescanning")
+                return 0
+            uuids.bits[:] = bits
+            uuids.count = index['count']
+            self.existing_uuids = uuids
+            return index['offset']
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable UUID index: {e}")
+            return 0
+
+    def _save_uuid_index(self, offset: int) -> None:
+        """Record existing_uuids and the CSV offset it covers in the sidecar index.
+
+        The filter bits go to a raw binary file; the JSON index holds the
+        offset, filter parameters and checksums tying the two to the CSV.
+        """
+        try:
+            with self.csv_path.open('rb') as raw:
+                fingerprint = self._csv_fingerprint(raw, offset)
+            bits = bytes(self.existing_uuids.bits)
+            _write_bytes_atomic(self.bloom_path, bits)
+            _write_json_atomic(self.index_path, {
+                'offset': offset,
+                'fingerprint': fingerprint,
+                'count': self.existing_uuids.count,
+                'size': self.existing_uuids.size,
+                'hash_count': self.existing_uuids.hash_count,
+                'bits_digest': hashlib.blake2b(bits, digest_size=16).hexdigest()
+            })
+        except Exception as e:
+            logging.error(f"Error saving UUID index: {e}")
+
+    def _load_material_cache(self) -> None:
+        try:
+            if self.material_cache_path.exists():
+                with self.material_cache_path.open('r', encoding='utf-8') as f:
+                    self._saved_materials = json.load(f)
+                PrinterAPI._material_cache.update(self._saved_materials)
+                logging.info(f"Loaded {len(self._saved_materials)} cached material names")
+        except Exception as e:
+            logging.error(f"Error loading material cache: {e}")
+
+    def _save_material_cache(self) -> None:
+        # "Unknown" may come from a transient failure, so it is not persisted
+        materials = {guid: name for guid, name in PrinterAPI._material_cache.items() if name != "Unknown"}
+        if materials == self._saved_materials:
+            return
+        try:
+            _write_json_atomic(self.material_cache_path, materials)
+            self._saved_materials = materials
+        except Exception as e:
+            logging.error(f"Error saving material cache: {e}")
+
+    def _load_validators(self) -> None:
+        try:
+            if self.validators_path.exists():
+                with self.validators_path.open('r', encoding='utf-8') as f:
+                    validators = json.load(f)
+                for printer in self.printers:
+                    printer.validators = validators.get(printer.ip, {})
+        except Exception as e:
+            logging.error(f"Error loading HTTP validators: {e}")
+
+    def _save_validators(self) -> None:
+        validators = {printer.ip: printer.validators for printer in self.printers if printer.validators}
+        try:
+            _write_json_atomic(self.validators_path, validators)
+        except Exception as e:
+            logging.error(f"Error saving HTTP validators: {e}")
+
+    def _load_scan_state(self) -> None:
+        try:
+            if self.scan_state_path.exists():
+                with self.scan_state_path.open('r', encoding='utf-8') as f:
+                    scan_state = json.load(f)
+                for printer in self.printers:
+                    printer.history_complete = bool(scan_state.get(printer.ip, False))
+        except Exception as e:
+            logging.error(f"Error loading scan state: {e}")
+
+    def _save_scan_state(self) -> None:
+        scan_state = {printer.ip: printer.history_complete for printer in self.printers}
+        try:
+            _write_json_atomic(self.scan_state_path, scan_state)
+        except Exception as e:
+            logging.error(f"Error saving scan state: {e}")
 
     def collect_logs(self):
-        all_print_jobs = []
+        if not self.printers:
+            return
+
+        # Printers are polled concurrently; the work is network bound and the
+        # shared session is safe for concurrent GETs. Workers only read
+        # existing_uuids, so it needs no locking.
+        with ThreadPoolExecutor(max_workers=self._printer_workers()) as executor:
+            results = list(executor.map(self._collect_for_printer, self.printers))
+        all_print_jobs = [job for jobs, _ in results for job in jobs]
+
+        # A page answered 304 next time is skipped, so only keep its
+        # validators once the jobs it held are in the log
+        if all_print_jobs and not self._save_jobs(all_print_jobs):
+            return
+        for printer, (_, finished) in zip(self.printers, results):
+            printer.history_complete = finished
+            if finished:
+                printer.commit_validators()
+            else:
+                printer.discard_validators()
+        self._save_scan_state()
+        self._save_validators()
 
-        for printer in self.printers:
-            logging.info(f"Connecting to printer: {printer.ip}")
-            printer_name = printer.name
-            logging.info(f"Printer name: {printer_name}")
+    def _collect_for_printer(self, printer: PrinterAPI) -> Tuple[List[tuple], bool]:
+        """Collect new print jobs from a single printer.
 
+        Also returns whether the scan finished normally; a scan cut short by
+        a failed request leaves older history to pick up on the next run.
+        """
+        print_jobs = []
+        finished = False
+        logging.info(f"Connecting to printer: {printer.ip}")
+        printer_name = printer.name
+        logging.info(f"Printer name: {printer_name}")
+
+        # Keep one history page in flight while the current one is processed
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
             offset = 0
+            next_page = prefetch.submit(printer.make_request, self._history_endpoint(offset), conditional=True)
             while True:
-                history = printer.make_request(f"history/print_jobs?offset={offset}&count={CONFIG['BATCH_SIZE']}")
+                history = next_page.result()
+                if history is NOT_MODIFIED:
+                    # The printer reports this page unchanged since the last poll
+                    finished = True
+                    break
                 if not isinstance(history, list):
                     logging.warning(f"Unexpected response type from {printer.ip}: {type(history)}")
                     break
 
+                # History is newest-first, so once an earlier scan has reached the
+                # end of history, a page with nothing new means the rest has been
+                # saved. Only jobs we would log count, otherwise an unlogged
+                # result keeps the scan going.
+                page_uuids = {
+                    job.get('uuid') for job in history
+                    if isinstance(job, dict) and job.get('result') in LOGGED_RESULTS
+                }
+                if (printer.history_complete and page_uuids
+                        and all(uuid in self.existing_uuids for uuid in page_uuids)):
+                    finished = True
+                    break
+
+                more = len(history) >= CONFIG['BATCH_SIZE']
+                if more:
+                    offset += CONFIG['BATCH_SIZE']
+                    next_page = prefetch.submit(printer.make_request, self._history_endpoint(offset), conditional=True)
+
+                new_jobs = []
                 for job in history:
-                    if isinstance(job, dict):
-                        processed_job = self._process_print_job(printer, job)
-                        if processed_job and job.get('uuid') not in self.existing_uuids:
-                            all_print_jobs.append(processed_job)
-                    else:
+                    if not isinstance(job, dict):
                         logging.debug(f"Skipping non-dictionary job entry: {type(job)}")
+                        continue
+                    uuid = job.get('uuid')
+                    if uuid and job.get('result') in LOGGED_RESULTS and uuid not in self.existing_uuids:
+                        new_jobs.append(job)
 
-                if len(history) < CONFIG['BATCH_SIZE']:
+                # Resolve each distinct material once for the whole page
+                guids = {
+                    guid for job in new_jobs
+                    for guid in (job.get('material_0_guid', ''), job.get('material_1_guid', ''))
+                    if guid
+                }
+                name_map = self._resolve_material_names(printer, guids)
+
+                for job in new_jobs:
+                    processed_job = self._process_print_job(printer, job, name_map)
+                    if processed_job:
+                        print_jobs.append(processed_job)
+
+                if not more:
+                    finished = True
                     break
-                offset += CONFIG['BATCH_SIZE']
 
-        if all_print_jobs:
-            self._save_jobs(all_print_jobs)
+        return print_jobs, finished
+
+    @staticmethod
+    def _resolve_material_names(printer: PrinterAPI, guids: Set[str]) -> Dict[str, str]:
+        """Look up material names for a printer, fetching uncached GUIDs concurrently."""
+        if len(guids) < 2:
+            return {guid: printer.get_material_name(guid) for guid in guids}
+        guids = list(guids)
+        with ThreadPoolExecutor(max_workers=min(CONFIG['MATERIAL_WORKERS'], len(guids))) as executor:
+            return dict(zip(guids, executor.map(printer.get_material_name, guids)))
+
+    @staticmethod
+    def _history_endpoint(offset: int) -> str:
+        return f"history/print_jobs?offset={offset}&count={CONFIG['BATCH_SIZE']}"
 
-    def _process_print_job(self, printer: PrinterAPI, job: dict) -> Optional[dict]:
-        """Process a single print job."""
+    def _process_print_job(self, printer: PrinterAPI, job: dict, name_map: Dict[str, str]) -> Optional[tuple]:
+        """Process a single print job into a row ordered like FIELDNAMES.
+
+        Material names are taken from name_map.
+        """
         # Only process completed or aborted prints
-        if job.get('result') not in ['Finished', 'Aborted']:
+        if job.get('result') not in LOGGED_RESULTS:
             return None
 
         # Ensure we have a dictionary
@@ -148,82 +557,122 @@ class UltimakerLogger:
             return None
 
         try:
+            datetime_started = job.get('datetime_started', '')
+
             # Get the date in YYYY-MM-DD format from datetime_started
             start_date = ''
-            if job.get('datetime_started'):
-                dt = datetime.fromisoformat(job.get('datetime_started', '').replace('Z', '+00:00'))
-                start_date = dt.date().isoformat()
-
-            return {
-                'uuid': job.get('uuid', ''),
-                'printer_name': printer.name,
-                'date': start_date,                    
-                'datetime_started': self._convert_to_pst(job.get('datetime_started', '')),
-                'datetime_finished': self._convert_to_pst(job.get('datetime_finished', '')),
-                'name': job.get('name', ''),
-                'result': job.get('result', ''),
-                'time_total': job.get('time_total', 0),
-                'material_0_amount': max(0, job.get('material_0_amount', 0)),
-                'material_1_amount': max(0, job.get('material_1_amount', 0)),
-                'material_0_name': printer.get_material_name(job.get('material_0_guid', '')),
-                'material_1_name': printer.get_material_name(job.get('material_1_guid', ''))
-            }
+            if datetime_started:
+                start_date = self._parse_iso_timestamp(datetime_started).date().isoformat()
+
+            return (
+                job.get('uuid', ''),
+                printer.name,
+                start_date,
+                self._convert_to_pst(datetime_started),
+                self._convert_to_pst(job.get('datetime_finished', '')),
+                job.get('name', ''),
+                job.get('result', ''),
+                job.get('time_total', 0),
+                max(0, job.get('material_0_amount', 0)),
+                max(0, job.get('material_1_amount', 0)),
+                name_map.get(job.get('material_0_guid', ''), "Unknown"),
+                name_map.get(job.get('material_1_guid', ''), "Unknown")
+            )
         except Exception as e:
             logging.debug(f"Error processing job: {e}, Job data: {job}")
             return None
 
-    def _save_jobs(self, print_jobs: list):
-        fieldnames = [
-            'uuid', 'printer_name', 'date', 'datetime_started', 'datetime_finished', 
-            'name', 'result', 'time_total', 'material_0_amount', 
-            'material_1_amount', 'material_0_name', 'material_1_name'
-        ]
-
+    def _save_jobs(self, rows: List[tuple]) -> bool:
+        """Save rows to the CSV and Google Sheets; return whether the CSV was written."""
         try:
-            # Save to CSV
+            # Save to CSV. Duplicate detection comes from the CSV, so the rows
+            # must be on disk before they are published anywhere else; errors
+            # such as a full disk surface at flush time.
             file_exists = self.csv_path.exists()
             with self.csv_path.open('a' if file_exists else 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer = csv.writer(f)
                 if not file_exists:
-                    writer.writeheader()
-                writer.writerows(print_jobs)
-
-            # Update Google Sheets
-            self._update_google_sheets(print_jobs, fieldnames)
-            
-            logging.info(f"Successfully saved {len(print_jobs)} new print jobs")
-            
+                    writer.writerow(FIELDNAMES)
+                writer.writerows(rows)
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Upload to Google Sheets while the filter and its index are updated
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                sheets_upload = executor.submit(self._update_google_sheets, rows)
+
+                # Keep the filter and its index in step with the CSV
+                for row in rows:
+                    self.existing_uuids.add(row[0])
+                self._save_uuid_index(self.csv_path.stat().st_size)
+
+                sheets_upload.result()
+
+            logging.info(f"Successfully saved {len(rows)} new print jobs")
+            self._save_material_cache()
+            return True
+
         except Exception as e:
             logging.error(f"Error saving jobs: {e}")
+            return False
 
-    def _update_google_sheets(self, print_jobs: list, fieldnames: list, batch_size: int = 100):
-        try:
-            scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-            creds = ServiceAccountCredentials.from_json_keyfile_name(CONFIG['CREDENTIALS_PATH'], scope)
-            client = gspread.authorize(creds)
-            sheet = client.open(CONFIG['SHEET_NAME']).sheet1
-
-            # Convert dictionaries to lists in the correct order
-            rows = [[job[field] for field in fieldnames] for job in print_jobs]
+    def _get_sheets_session(self) -> AuthorizedSession:
+        """Create the authorized Sheets session once; it refreshes its own token."""
+        if self._gsession is None:
+            creds = Credentials.from_service_account_file(CONFIG['CREDENTIALS_PATH'], scopes=SHEETS_SCOPES)
+            self._gsession = AuthorizedSession(creds)
+        return self._gsession
 
-            # Batch upload
-            for i in range(0, len(rows), batch_size):
-                batch = rows[i:i + batch_size]
-                sheet.append_rows(batch)
-                if i + batch_size < len(rows):
-                    time.sleep(1)  # Rate limiting
+    def _get_append_url(self) -> str:
+        """Look up the spreadsheet and its first worksheet once, then reuse the URL."""
+        if self._append_url is None:
+            client = gspread.authorize(self._get_sheets_session().credentials)
+            spreadsheet = client.open(CONFIG['SHEET_NAME'])
+            sheet_range = quote(f"'{spreadsheet.sheet1.title}'!A1", safe='')
+            self._append_url = (
+                f"https://sheets.googleapis.com/v4/spreadsheets/{spreadsheet.id}/values/{sheet_range}:append"
+            )
+        return self._append_url
 
+    def _update_google_sheets(self, rows: list):
+        try:
+            self._append_rows(rows)
         except Exception as e:
-            logging.error(f"Failed to update Google Sheets: {e}")
+            uuids = ', '.join(row[0] for row in rows)
+            logging.error(f"Failed to update Google Sheets: {e}. Rows not uploaded: {uuids}")
+
+    def _append_rows(self, rows: list):
+        """Append rows in one request, backing off and retrying while rate limited."""
+        for attempt in range(CONFIG['SHEETS_MAX_RETRIES'] + 1):
+            response = self._get_sheets_session().post(
+                self._get_append_url(),
+                params={'valueInputOption': 'RAW', 'insertDataOption': 'INSERT_ROWS'},
+                json={'values': rows},
+                timeout=CONFIG['SHEETS_TIMEOUT']
+            )
+            if response.status_code != 429 or attempt == CONFIG['SHEETS_MAX_RETRIES']:
+                break
+            # 429 means the per-minute write quota is spent, so wait it out
+            retry_after = response.headers.get('Retry-After', '')
+            delay = int(retry_after) if retry_after.isdigit() else 2 ** attempt
+            logging.warning(f"Google Sheets rate limited, retrying in {delay}s")
+            time.sleep(delay)
+        response.raise_for_status()
+
+    @staticmethod
+    def _parse_iso_timestamp(iso_timestamp: str) -> datetime:
+        # fromisoformat() only accepts a trailing 'Z' from Python 3.11
+        if iso_timestamp.endswith('Z'):
+            iso_timestamp = iso_timestamp[:-1] + '+00:00'
+        return datetime.fromisoformat(iso_timestamp)
 
     @staticmethod
     def _convert_to_pst(iso_timestamp: str) -> str:
         if not iso_timestamp:
             return ""
         try:
-            utc_time = datetime.fromisoformat(iso_timestamp.replace("Z", "+00:00"))
-            pst_timezone = pytz.timezone("America/Los_Angeles")
-            return utc_time.astimezone(pst_timezone).isoformat()
+            utc_time = UltimakerLogger._parse_iso_timestamp(iso_timestamp)
+            return utc_time.astimezone(_PST).isoformat()
         except Exception as e:
             logging.error(f"Error converting timestamp: {iso_timestamp}. Error: {e}")
             return iso_timestamp